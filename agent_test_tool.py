@@ -4,14 +4,18 @@
 agent_test_tool.py — 带 LLM 分析的智能测试小工具
 
 功能概览：
-1) 读取测试用例（JSON/YAML），对子进程（你的程序/脚本/可执行文件）进行批量测试。
+1) 读取测试用例（JSON/JSONL/YAML），对子进程（你的程序/脚本/可执行文件）进行批量测试。
 2) 失败时调用 LLM 进行错误分析与修复建议（可选）。
 3) 生成控制台报告与机器可读的 JUnit XML（可选）。
 4) 支持输入/输出规范化（去空格、忽略行序、正则提取等）。
 5) 一键初始化样例用例文件与配置。
 
 依赖：
-  pip install pyyaml openai junit-xml
+  pip install pyyaml openai
+  pip install ijson            # 可选：流式读取超大 JSON 用例文件
+  pip install orjson           # 可选：更快的 JSON 读写
+  # YAML 解析会优先使用 libyaml 的 C 加速（需系统装有 libyaml，如 apt install libyaml-dev 后重装 pyyaml）
+  pip install xxhash           # 可选：更快的输出缓存键计算（否则用 hashlib.blake2b）
 
 环境变量（可选）：
   OPENAI_API_KEY         —— OpenAI API 密钥
@@ -26,6 +30,7 @@ agent_test_tool.py — 带 LLM 分析的智能测试小工具
   # 运行：指定被测命令和测试文件
   python agent_test_tool.py --cmd "python your_code.py" --tests tests.json
   python agent_test_tool.py --cmd "./your_binary" --tests tests.yaml
+  python agent_test_tool.py --cmd "python your_code.py" --tests tests_enum.jsonl   # 一行一个用例
 
   # 生成 JUnit 报告
   python agent_test_tool.py --cmd "python your_code.py" --tests tests.json --junit report.xml
@@ -33,7 +38,15 @@ agent_test_tool.py — 带 LLM 分析的智能测试小工具
   # 禁用 LLM 分析
   python agent_test_tool.py --cmd "python your_code.py" --tests tests.json --no-llm
 
-测试文件 schema（JSON/YAML 等价）：
+  # 指定并发数（默认 CPU 核数）
+  python agent_test_tool.py --cmd "python your_code.py" --tests tests.json --jobs 8
+
+  # 输出缓存（默认关闭）：相同命令（及命令行中出现的文件未变更）+ 相同输入的成功运行
+  # 直接复用上次结果。缓存不跟踪被测程序间接依赖的文件（import 的模块、配置等），
+  # 只应在被测程序稳定时启用
+  python agent_test_tool.py --cmd "python your_code.py" --tests tests.json --cache-dir .cache
+
+测试文件 schema（JSON/YAML 等价；JSONL 为每行一个下述对象）：
 [
   {
     "name": "add small",
@@ -53,120 +66,486 @@ agent_test_tool.py — 带 LLM 分析的智能测试小工具
 
 from __future__ import annotations
 import argparse
+import asyncio
+import hashlib
 import json
 import os
 import re
 import shlex
-import subprocess
+import shutil
+import struct
 import sys
-import textwrap
+from array import array
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache, partial
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import XMLGenerator
 
 try:
     import yaml  # type: ignore
+    try:
+        # libyaml 的 C 实现，比纯 Python 的 SafeLoader 快一个数量级
+        from yaml import CSafeLoader as YamlLoader  # type: ignore
+    except ImportError:
+        from yaml import SafeLoader as YamlLoader  # type: ignore
 except Exception:
     yaml = None
 
 try:
-    from junit_xml import TestSuite, TestCase  # type: ignore
+    import ijson  # type: ignore
+except Exception:
+    ijson = None
+
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None
+
+try:
+    import xxhash  # type: ignore
 except Exception:
-    TestSuite = None
-    TestCase = None
+    xxhash = None
 
 # ============== 工具函数 ==============
 
+_WS_RE = re.compile(r"\s+")
+_WS_RE_B = re.compile(rb"\s+")
+# str 会视作空白/换行、而 bytes 不会的 ASCII 控制字符；含这些字符时退回 str 路径
+_STR_ONLY_SEP_B = re.compile(rb"[\x0b\x0c\x1c-\x1f]")
+# 按规则集缓存的已编译规范化函数个数上限：整套用例共享同一 normalize 配置时只编译一次，
+# 每条用例各带不同 regex_extract 的生成用例集也不会无限占用内存
+_NORMALIZER_CACHE_SIZE = 256
+
+
 def debug(msg: str):
     print(f"[agent] {msg}")
 
 
-def load_tests(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = f.read()
+def _iter_json_items(f) -> Iterator[Dict[str, Any]]:
+    with f:
+        yield from ijson.items(f, "item", use_float=True)
+
+
+def _iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def _starts_with_array(f) -> bool:
+    """跳过任意长的前导空白，看首个非空白字节是否为 [。"""
+    while True:
+        chunk = f.read(4096)
+        if not chunk:
+            return False
+        chunk = chunk.lstrip()
+        if chunk:
+            return chunk.startswith(b"[")
+
+
+def load_tests(path: str) -> Iterable[Dict[str, Any]]:
     # 判定格式
+    if path.lower().endswith('.jsonl'):
+        # 一行一个用例，逐行解析
+        return _iter_jsonl(path)
     if path.lower().endswith(('.yaml', '.yml')):
         if yaml is None:
             raise RuntimeError("需要 pyyaml: pip install pyyaml")
-        tests = yaml.safe_load(data)
+        with open(path, "r", encoding="utf-8") as f:
+            tests = yaml.load(f, Loader=YamlLoader)
+    elif ijson is not None:
+        # 流式解析：逐条产出用例，内存占用与文件大小无关
+        f = open(path, "rb")
+        is_array = _starts_with_array(f)
+        f.seek(0)
+        if not is_array:
+            f.close()
+            raise ValueError("测试文件应为数组(List)")
+        return _iter_json_items(f)
+    elif orjson is not None:
+        with open(path, "rb") as f:
+            tests = orjson.loads(f.read())
     else:
-        tests = json.loads(data)
+        with open(path, "r", encoding="utf-8") as f:
+            tests = json.loads(f.read())
     if not isinstance(tests, list):
         raise ValueError("测试文件应为数组(List)")
     return tests
 
 
-def normalize_text(s: str, rules: Dict[str, Any]) -> str:
-    if s is None:
-        return ""
-    out = s
-    if rules.get("regex_extract"):
-        pattern = rules["regex_extract"]
-        m = re.search(pattern, out, re.S)
-        out = m.group(1) if m else out
+def _chain(steps: List[Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    if not steps:
+        return lambda x: x
+    if len(steps) == 1:
+        return steps[0]
+
+    def run(x):
+        for f in steps:
+            x = f(x)
+        return x
+    return run
+
+
+def _extract_step(pat: "re.Pattern[Any]") -> Callable[[Any], Any]:
+    def extract(x):
+        m = pat.search(x)
+        return m.group(1) if m else x
+    return extract
+
+
+def _extract_pattern_b(pattern: str) -> Optional["re.Pattern[bytes]"]:
+    """regex_extract 的 bytes 版本；非 ASCII 或 flag 与 bytes 不兼容时返回 None。"""
+    if not pattern.isascii():
+        return None
+    try:
+        return re.compile(pattern.encode("ascii"), re.S)
+    except re.error:
+        return None
+
+
+def _build_normalizers(rules: Dict[str, Any]) -> Tuple[Callable[[str], str], Callable[[bytes], bytes]]:
+    text_steps: List[Callable[[str], str]] = []
+    bytes_steps: List[Callable[[bytes], bytes]] = []
+    bytes_ok = True
+    pattern = rules.get("regex_extract")
+    if pattern:
+        text_steps.append(_extract_step(re.compile(pattern, re.S)))
+        pat_b = _extract_pattern_b(pattern)
+        bytes_ok = pat_b is not None
+        if bytes_ok:
+            bytes_steps.append(_extract_step(pat_b))
     if rules.get("strip", True):
-        out = out.strip()
+        text_steps.append(str.strip)
+        bytes_steps.append(bytes.strip)
     if rules.get("collapse_ws", False):
-        out = re.sub(r"\s+", " ", out)
+        text_steps.append(partial(_WS_RE.sub, " "))
+        bytes_steps.append(partial(_WS_RE_B.sub, b" "))
     if rules.get("lower", False):
-        out = out.lower()
+        text_steps.append(str.lower)
+        bytes_steps.append(bytes.lower)
     if rules.get("sort_lines", False):
-        lines = [ln.rstrip() for ln in out.splitlines()]
-        out = "\n".join(sorted(lines))
-    return out
+        text_steps.append(lambda x: "\n".join(sorted(map(str.rstrip, x.splitlines()))))
+        bytes_steps.append(lambda x: b"\n".join(sorted(map(bytes.rstrip, x.splitlines()))))
+
+    text_fn = _chain(text_steps)
+    fast = _chain(bytes_steps) if bytes_ok else None
+
+    def bytes_fn(buf: bytes) -> bytes:
+        # 纯 ASCII 输出直接在 bytes 上处理，省去解码/再编码；其余情况解码后走 str 路径，语义一致
+        if fast is None or not buf.isascii() or _STR_ONLY_SEP_B.search(buf):
+            return text_fn(buf.decode("utf-8", errors="replace")).encode("utf-8")
+        return fast(buf)
+
+    return text_fn, bytes_fn
+
+
+@lru_cache(maxsize=_NORMALIZER_CACHE_SIZE)
+def _cached_normalizers(items: Tuple[Tuple[Any, Any], ...]) -> Tuple[Callable[[str], str], Callable[[bytes], bytes]]:
+    return _build_normalizers(dict(items))
+
+
+def _normalizers(rules: Dict[str, Any]) -> Tuple[Callable[[str], str], Callable[[bytes], bytes]]:
+    try:
+        return _cached_normalizers(tuple(sorted(rules.items())))
+    except TypeError:
+        # 规则值不可哈希（非常规配置），不缓存
+        return _build_normalizers(rules)
+
+
+def compile_normalizer(rules: Dict[str, Any]) -> Callable[[bytes], bytes]:
+    """把一组 normalize 规则编译为只包含所需步骤的函数（按规则集缓存），
+    调用时不再逐条查询规则字典。"""
+    return _normalizers(rules)[1]
+
+
+def normalize_text(s: str, rules: Dict[str, Any]) -> str:
+    if s is None:
+        return ""
+    return _normalizers(rules)[0](s)
+
+
+def normalize_bytes(buf: bytes, rules: Dict[str, Any]) -> bytes:
+    """normalize_text 的 bytes 版本，结果与之完全一致。"""
+    if buf is None:
+        return b""
+    return compile_normalizer(rules)(buf)
+
+
+def _text(b: bytes) -> str:
+    return b.decode("utf-8", errors="replace")
 
 
 @dataclass
 class CaseResult:
     name: str
     passed: bool
-    expected: str
-    actual: str
+    # expected/actual/stderr 保留为 bytes，仅在打印与生成报告时解码
+    expected: bytes
+    actual: bytes
     input_data: str
-    stderr: str
+    stderr: bytes
     exit_code: int
     duration: float
     analysis: Optional[str] = None
 
 
+@dataclass
+class SuiteResults:
+    """按列存储整套结果：名称/通过/耗时放在紧凑数组中，完整 CaseResult 只保留失败用例。"""
+    names: List[str] = field(default_factory=list)
+    passed: "array[int]" = field(default_factory=lambda: array("b"))
+    durations: "array[float]" = field(default_factory=lambda: array("d"))
+    failures: Dict[int, CaseResult] = field(default_factory=dict)
+
+    def append(self, r: CaseResult):
+        if not r.passed:
+            self.failures[len(self.names)] = r
+        self.names.append(r.name)
+        self.passed.append(r.passed)
+        self.durations.append(r.duration)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def passed_count(self) -> int:
+        return self.passed.count(1)
+
+
 # ============== 子进程执行 ==============
 
-def run_one(cmd: str, input_data: str, timeout: Optional[float]) -> Tuple[str, str, int, float]:
+@lru_cache(maxsize=None)
+def _seal_inherited_fds() -> bool:
+    """把本进程从自己的父进程继承来的 fd（3 及以上）标为不可继承，只做一次。
+
+    Python 自己打开的 fd 默认不可继承（PEP 446），但启动时已打开的 fd（如 shell 的
+    exec 7<file）不受此约束。列不出 fd 时返回 False。
+    """
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        try:
+            names = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for name in names:
+            fd = int(name)
+            if fd > 2:
+                try:
+                    os.set_inheritable(fd, False)
+                except OSError:
+                    pass  # listdir 自身用过、已关闭的 fd
+        return True
+    return False
+
+
+# 子进程启动参数：executable 取绝对路径且 close_fds=False 时，CPython 在 Linux 上走
+# posix_spawn（vfork 语义）而非 fork+exec，父进程 RSS 越大收益越明显。
+# close_fds=False 的前提是没有可继承的 fd：先由 _seal_inherited_fds 处理启动时继承来的 fd，
+# 做不到时退回 close_fds=True。
+def _spawn_kwargs(executable: Optional[str]) -> Dict[str, Any]:
+    kw: Dict[str, Any] = dict(close_fds=not _seal_inherited_fds())
+    if executable:
+        kw["executable"] = executable
+    return kw
+
+
+def _kill(proc) -> None:
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        # 超时判定与子进程自行退出之间的竞态：进程已被回收
+        pass
+
+
+# 超时 kill 之后给管道排空留的时间。被测命令经 sh/make/npm 等包装时，孙进程可能继承
+# stdout/stderr 一直不退出，管道等不到 EOF，不能无限期等待
+_DRAIN_GRACE = 0.1
+
+
+async def _feed(stream, data: bytes) -> None:
+    try:
+        stream.write(data)
+        await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # 子进程不读 stdin 就退出
+    finally:
+        stream.close()
+
+
+async def _drain(stream, buf: bytearray) -> None:
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return
+        buf += chunk
+
+
+async def run_one_async(argv: List[str], input_data: str, timeout: Optional[float],
+                        executable: Optional[str] = None) -> Tuple[bytes, bytes, int, float]:
+    """异步执行一个用例：多个用例的子进程 I/O 可同时在途，由事件循环统一调度。
+
+    超时语义与 subprocess.run 一致：到时 kill 子进程，返回已读到的部分输出与退出码 124。
+    """
     import time
     start = time.time()
+    proc = await asyncio.create_subprocess_exec(
+        *argv,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        **_spawn_kwargs(executable),
+    )
+    # 输出读进自己的缓冲区：超时后取消读取任务也不会丢掉已读到的部分
+    out, err = bytearray(), bytearray()
+    io_tasks = [
+        asyncio.ensure_future(_feed(proc.stdin, input_data.encode("utf-8"))),
+        asyncio.ensure_future(_drain(proc.stdout, out)),
+        asyncio.ensure_future(_drain(proc.stderr, err)),
+    ]
+    wait_task = asyncio.ensure_future(proc.wait())
     try:
-        proc = subprocess.run(
-            shlex.split(cmd),
-            input=input_data.encode("utf-8"),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=timeout,
-        )
-        duration = time.time() - start
-        return (
-            proc.stdout.decode("utf-8", errors="replace"),
-            proc.stderr.decode("utf-8", errors="replace"),
-            proc.returncode,
-            duration,
-        )
-    except subprocess.TimeoutExpired as e:
-        duration = time.time() - start
-        return (e.output.decode("utf-8", errors="replace") if e.output else "",
-                e.stderr.decode("utf-8", errors="replace") if e.stderr else "<timeout>",
-                124,
-                duration)
+        _, not_done = await asyncio.wait([*io_tasks, wait_task], timeout=timeout)
+        if not_done:
+            _kill(proc)
+            # 不等 proc.wait()：asyncio 要等管道全部关闭才算进程结束，同样会被孙进程拖住
+            _, not_done = await asyncio.wait(io_tasks, timeout=_DRAIN_GRACE)
+            if not_done:
+                # 孙进程仍持有管道：关闭我方管道端。asyncio.subprocess.Process 没有公开的 close()，
+                # 只能经底层 transport，否则它要到事件循环关闭后才被回收
+                proc._transport.close()
+            duration = time.time() - start
+            return (bytes(out),
+                    bytes(err) or b"<timeout>",
+                    124,
+                    duration)
+    finally:
+        if not wait_task.done():
+            _kill(proc)
+        for task in (*io_tasks, wait_task):
+            task.cancel()
+    duration = time.time() - start
+    return bytes(out), bytes(err), proc.returncode, duration
+
+
+# ============== 输出缓存 ==============
+
+def _hash_hex(data: bytes) -> str:
+    if xxhash is not None:
+        return xxhash.xxh3_128(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _argv_fingerprint(argv: List[str]) -> bytes:
+    """命令行 + 其中出现的文件（含解析后的可执行文件）的 mtime/size，文件变更即缓存失效。"""
+    parts = [repr(argv)]
+    paths = [shutil.which(argv[0]) or argv[0], *argv[1:]] if argv else []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except (OSError, ValueError):
+            continue
+        if not os.path.isdir(path):
+            parts.append(f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}")
+    return "\0".join(parts).encode("utf-8", errors="surrogateescape")
+
+
+class OutputCache:
+    """以 (命令指纹, 输入, 超时) 内容寻址、跨运行持久化的子进程输出缓存。
+
+    只缓存正常结束且退出码为 0 的运行；每条记录一个文件，写入经 os.replace 原子落盘，
+    多个进程共用同一缓存目录也不会读到半截数据。记录为定长头 + 原始 stdout/stderr 字节，
+    读取时只做长度校验，不反序列化任何对象。
+    """
+
+    # magic, exit_code, len(stdout), len(stderr), duration
+    _HEADER = struct.Struct("<4siQQd")
+    _MAGIC = b"ATC1"
+
+    def __init__(self, cache_dir: str, argv: List[str]):
+        self.root = os.path.expanduser(cache_dir)
+        self._prefix = _argv_fingerprint(argv) + b"\0"
+        self.hits = 0
+
+    def key(self, input_data: str, timeout: Optional[float]) -> str:
+        return _hash_hex(self._prefix + repr(timeout).encode() + b"\0" + input_data.encode("utf-8"))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, bytes, int, float]]:
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        hsize = self._HEADER.size
+        if len(data) < hsize:
+            return None
+        magic, code, n_out, n_err, duration = self._HEADER.unpack_from(data)
+        if magic != self._MAGIC or len(data) != hsize + n_out + n_err:
+            return None
+        self.hits += 1
+        return data[hsize:hsize + n_out], data[hsize + n_out:], code, duration
+
+    def put(self, key: str, value: Tuple[bytes, bytes, int, float]):
+        if value[2] != 0:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            out, err, code, duration = value
+            with open(tmp, "wb") as f:
+                f.write(self._HEADER.pack(self._MAGIC, code, len(out), len(err), duration))
+                f.write(out)
+                f.write(err)
+            os.replace(tmp, path)
+        except OSError as e:
+            debug(f"写入输出缓存失败: {e}")
 
 
 # ============== LLM 分析 ==============
 
-def llm_analyze(input_data: str, expected: str, actual: str, stderr: str, cmd: str) -> str:
-    """调用 OpenAI 兼容接口对失败原因进行分析。支持自定义 BASE_URL 与模型名。"""
-    try:
-        from openai import OpenAI  # type: ignore
-    except Exception:
-        return "未安装 openai 包，无法进行 LLM 分析。请 pip install openai"
+# 所有失败用例共用一个客户端与连接池，复用 TCP/TLS 连接
+_HTTP_LIMITS = dict(max_connections=64, max_keepalive_connections=32)
+
+
+@lru_cache(maxsize=1)
+def _warn_no_credentials():
+    # 异步客户端构造失败时会退回同步客户端，提醒只打印一次
+    debug("未检测到 OPENAI_API_KEY（或私有化 OPENAI_BASE_URL），尝试无鉴权调用……")
+
 
+def _client_kwargs() -> Dict[str, Any]:
     base_url = os.getenv("OPENAI_BASE_URL")
     api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key and not base_url:
+        # 允许用户只配置本地私有化网关无需 key 的情况，但如果两者都空，提醒
+        _warn_no_credentials()
+    return dict(base_url=base_url, api_key=api_key)
+
+
+@lru_cache(maxsize=1)
+def _client():
+    from openai import OpenAI  # type: ignore
+    import httpx  # type: ignore
+    return OpenAI(**_client_kwargs(), http_client=httpx.Client(limits=httpx.Limits(**_HTTP_LIMITS)))
+
+
+def _async_client():
+    """异步客户端绑定事件循环，因此每次 run_suite 新建一个；openai 不可用时返回 None。"""
+    try:
+        from openai import AsyncOpenAI  # type: ignore
+        import httpx  # type: ignore
+        return AsyncOpenAI(**_client_kwargs(),
+                           http_client=httpx.AsyncClient(limits=httpx.Limits(**_HTTP_LIMITS)))
+    except Exception:
+        return None
+
+
+def _llm_request(input_data: str, expected: str, actual: str, stderr: str, cmd: str) -> Dict[str, Any]:
     model = os.getenv("AGENT_MODEL", "gpt-4o-mini")
     sys_prompt = os.getenv("AGENT_SYS_PROMPT", (
         "You are a senior software testing assistant. Given a failing test, "
@@ -174,12 +553,6 @@ def llm_analyze(input_data: str, expected: str, actual: str, stderr: str, cmd: s
         "If output mismatch is only formatting, propose normalization rules."
     ))
 
-    if not api_key and not base_url:
-        # 允许用户只配置本地私有化网关无需 key 的情况，但如果两者都空，提醒
-        debug("未检测到 OPENAI_API_KEY（或私有化 OPENAI_BASE_URL），尝试无鉴权调用……")
-
-    client = OpenAI(base_url=base_url, api_key=api_key)
-
     user_prompt = f"""
 被测命令:
 {cmd}
@@ -203,15 +576,37 @@ def llm_analyze(input_data: str, expected: str, actual: str, stderr: str, cmd: s
 4) 如为格式问题，建议可加入的 normalize 规则
 5) （可选）补充一个新的边界测试用例
 """
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": sys_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=0.2,
+    )
+
+
+def llm_analyze(input_data: str, expected: str, actual: str, stderr: str, cmd: str) -> str:
+    """调用 OpenAI 兼容接口对失败原因进行分析。支持自定义 BASE_URL 与模型名。"""
     try:
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.2,
-        )
+        import openai  # type: ignore  # noqa: F401
+    except Exception:
+        return "未安装 openai 包，无法进行 LLM 分析。请 pip install openai"
+
+    try:
+        resp = _client().chat.completions.create(**_llm_request(input_data, expected, actual, stderr, cmd))
+        return resp.choices[0].message.content or "(LLM 返回为空)"
+    except Exception as e:
+        return f"调用 LLM 失败：{e}"
+
+
+async def llm_analyze_async(client, input_data: str, expected: str, actual: str, stderr: str,
+                            cmd: str) -> str:
+    """llm_analyze 的异步版本，多个失败用例的分析请求可并发在途。"""
+    if client is None:
+        return await asyncio.to_thread(llm_analyze, input_data, expected, actual, stderr, cmd)
+    try:
+        resp = await client.chat.completions.create(**_llm_request(input_data, expected, actual, stderr, cmd))
         return resp.choices[0].message.content or "(LLM 返回为空)"
     except Exception as e:
         return f"调用 LLM 失败：{e}"
@@ -219,70 +614,203 @@ def llm_analyze(input_data: str, expected: str, actual: str, stderr: str, cmd: s
 
 # ============== 主流程 ==============
 
-def run_suite(cmd: str, tests: List[Dict[str, Any]], use_llm: bool = True) -> List[CaseResult]:
-    results: List[CaseResult] = []
-    for i, t in enumerate(tests, 1):
-        name = t.get("name", f"case_{i}")
-        input_data = t.get("input", "")
-        expected = t.get("expected", "")
-        timeout = t.get("timeout", None)
-        rules = t.get("normalize", {}) or {}
-
-        stdout, stderr, code, dur = run_one(cmd, input_data, timeout)
-        norm_expected = normalize_text(expected, rules)
-        norm_actual = normalize_text(stdout, rules)
-        passed = (norm_expected == norm_actual) and (code == 0)
-
-        analysis = None
-        if (not passed) and use_llm:
-            analysis = llm_analyze(input_data, norm_expected, norm_actual, stderr, cmd)
-
-        results.append(CaseResult(
-            name=name,
-            passed=passed,
-            expected=norm_expected,
-            actual=norm_actual,
-            input_data=input_data,
-            stderr=stderr,
-            exit_code=code,
-            duration=dur,
-            analysis=analysis,
-        ))
-
-        status = "✅ PASS" if passed else "❌ FAIL"
-        print(f"[{status}] {name} ({dur:.3f}s, code={code})")
-        if not passed:
-            print("— diff (expected vs actual) —")
-            print("EXPECTED:\n" + norm_expected)
-            print("ACTUAL:\n" + norm_actual)
-            if analysis:
-                print("— LLM analysis —\n" + analysis)
-            else:
-                print("(LLM 分析已关闭或失败)")
-        print()
+async def _run_case(i: int, t: Dict[str, Any], cmd: str,
+                    execute: Callable[[str, Optional[float]], Awaitable[Tuple[bytes, bytes, int, float]]],
+                    use_llm: bool, get_client: Optional[Callable[[], Any]] = None) -> CaseResult:
+    name = str(t.get("name", f"case_{i}"))
+    input_data = t.get("input", "")
+    expected = t.get("expected", "")
+    timeout = t.get("timeout", None)
+    rules = t.get("normalize", {}) or {}
+
+    stdout, stderr, code, dur = await execute(input_data, timeout)
+    normalize = compile_normalizer(rules)
+    norm_expected = normalize((expected or "").encode("utf-8"))
+    norm_actual = normalize(stdout)
+    passed = (norm_expected == norm_actual) and (code == 0)
+
+    analysis = None
+    if (not passed) and use_llm:
+        client = get_client() if get_client is not None else None
+        analysis = await llm_analyze_async(client, input_data, _text(norm_expected),
+                                           _text(norm_actual), _text(stderr), cmd)
+
+    return CaseResult(
+        name=name,
+        passed=passed,
+        expected=norm_expected,
+        actual=norm_actual,
+        input_data=input_data,
+        stderr=stderr,
+        exit_code=code,
+        duration=dur,
+        analysis=analysis,
+    )
+
+
+def _print_case(r: CaseResult):
+    status = "✅ PASS" if r.passed else "❌ FAIL"
+    print(f"[{status}] {r.name} ({r.duration:.3f}s, code={r.exit_code})")
+    if not r.passed:
+        print("— diff (expected vs actual) —")
+        print("EXPECTED:\n" + _text(r.expected))
+        print("ACTUAL:\n" + _text(r.actual))
+        if r.analysis:
+            print("— LLM analysis —\n" + r.analysis)
+        else:
+            print("(LLM 分析已关闭或失败)")
+    print()
+
+
+# 去重表容量相对于在途窗口的倍数：重复用例通常在日志中相邻出现，几倍窗口足以命中
+RUNS_PER_WINDOW = 4
+
+
+async def _run_suite_async(cmd: str, tests: Iterable[Dict[str, Any]], use_llm: bool,
+                           jobs: int, cache_dir: Optional[str]) -> SuiteResults:
+    sem = asyncio.Semaphore(jobs)
+    # cmd 在整套用例中不变，只分词一次
+    argv = shlex.split(cmd)
+    # 可执行文件同样只解析一次，得到绝对路径以便走 posix_spawn
+    executable = shutil.which(argv[0]) if argv else None
+    cache = OutputCache(cache_dir, argv) if cache_dir else None
+    # LLM 客户端在首个失败用例需要分析时才创建：全部通过时不构造客户端，也不提示缺少 key
+    clients: List[Any] = []
+
+    def get_client():
+        if not clients:
+            clients.append(_async_client())
+        return clients[0]
+
+    # 相同 (input, timeout) 的用例只启动一次子进程，其余别名共享同一份输出，
+    # 再各自按自己的 expected/normalize 判定。按原始输入去重：规范化后相同的输入
+    # 对被测程序未必等价（例如空白处理恰恰是被测点）。键取 (input, timeout) 的摘要，
+    # 按 LRU 只保留最近 RUNS_PER_WINDOW * window 个，内存不随用例数增长
+    runs: "OrderedDict[str, asyncio.Task[Tuple[bytes, bytes, int, float]]]" = OrderedDict()
+
+    async def bounded_run(input_data: str, timeout: Optional[float]) -> Tuple[bytes, bytes, int, float]:
+        key = cache.key(input_data, timeout) if cache else None
+        if cache:
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+        async with sem:
+            out = await run_one_async(argv, input_data, timeout, executable)
+        if cache:
+            cache.put(key, out)
+        return out
+
+    def execute(input_data: str, timeout: Optional[float]) -> "asyncio.Task[Tuple[bytes, bytes, int, float]]":
+        key = _hash_hex(f"{timeout!r}\0".encode("utf-8") + input_data.encode("utf-8"))
+        task = runs.get(key)
+        if task is None:
+            task = runs[key] = asyncio.ensure_future(bounded_run(input_data, timeout))
+            if len(runs) > runs_limit:
+                # 被淘汰的多半早已完成；仍在途的任务由等待它的用例持有，不受影响
+                runs.popitem(last=False)
+        else:
+            runs.move_to_end(key)
+        return task
+
+    # 惰性消费用例：最多 2*jobs 个在途（其中至多 jobs 个子进程在执行），按用例顺序收割并打印，
+    # 既避免输出交错，也不必一次性物化全部用例
+    window = 2 * jobs
+    runs_limit = RUNS_PER_WINDOW * window
+    pending: Deque["asyncio.Task[CaseResult]"] = deque()
+    results = SuiteResults()
+
+    async def reap():
+        r = await pending.popleft()
+        _print_case(r)
+        results.append(r)
 
+    try:
+        for i, t in enumerate(tests, 1):
+            pending.append(asyncio.ensure_future(_run_case(i, t, cmd, execute, use_llm, get_client)))
+            if len(pending) >= window:
+                await reap()
+        while pending:
+            await reap()
+    finally:
+        for task in pending:
+            task.cancel()
+        for task in runs.values():
+            task.cancel()
+        if clients and clients[0] is not None:
+            await clients[0].close()
+    if cache and cache.hits:
+        debug(f"输出缓存命中 {cache.hits} 次（{cache.root}）")
     return results
 
 
-def write_junit(results: List[CaseResult], path: str, suite_name: str = "agent-tests"):
-    if TestSuite is None or TestCase is None:
-        raise RuntimeError("需要 junit-xml: pip install junit-xml")
-    cases = []
-    for r in results:
-        tc = TestCase(r.name, classname=suite_name, elapsed_sec=r.duration)
-        if not r.passed:
-            msg = "输出不匹配或退出码非0"
-            detail = textwrap.dedent(f"""
-            INPUT:\n{r.input_data}\n\nEXPECTED:\n{r.expected}\n\nACTUAL:\n{r.actual}\n\nEXIT_CODE: {r.exit_code}\nSTDERR:\n{r.stderr}\n\nLLM ANALYSIS:\n{r.analysis or '(none)'}
-            """)
-            tc.add_failure_info(message=msg, output=detail)
-        cases.append(tc)
-    ts = TestSuite(suite_name, test_cases=cases)
-    with open(path, 'w', encoding='utf-8') as f:
-        TestSuite.to_file(f, [ts])
+def run_suite(cmd: str, tests: Iterable[Dict[str, Any]], use_llm: bool = True,
+              jobs: Optional[int] = None, cache_dir: Optional[str] = None) -> SuiteResults:
+    """cache_dir 非空时启用跨运行的子进程输出缓存（见 OutputCache），默认关闭。"""
+    return asyncio.run(_run_suite_async(cmd, tests, use_llm, jobs or os.cpu_count() or 1, cache_dir))
+
+
+# XML 1.0 不允许的字符（子进程输出中常见的控制字符等），写报告前去掉
+_XML_ILLEGAL_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def _xml_safe(s: str) -> str:
+    return _XML_ILLEGAL_RE.sub("", s)
+
+
+def write_junit(results: SuiteResults, path: str, suite_name: str = "agent-tests"):
+    """逐条流式写出 JUnit XML，不在内存中构建整棵对象树。"""
+    total = len(results)
+    counts = {
+        "disabled": "0",
+        "errors": "0",
+        "failures": str(len(results.failures)),
+        "tests": str(total),
+        "time": f"{sum(results.durations):.6f}",
+    }
+    # 先写临时文件再 os.replace，中途出错不会留下半截报告
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        _write_junit_to(tmp, results, counts, suite_name)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
     debug(f"JUnit report written: {path}")
 
 
+def _write_junit_to(path: str, results: SuiteResults, counts: Dict[str, str], suite_name: str):
+    with open(path, "wb") as f:
+        xg = XMLGenerator(f, encoding="utf-8", short_empty_elements=True)
+        xg.startDocument()
+        xg.startElement("testsuites", counts)
+        xg.ignorableWhitespace("\n\t")
+        xg.startElement("testsuite", {**counts, "name": suite_name, "skipped": "0"})
+        for i, (name, duration) in enumerate(zip(results.names, results.durations)):
+            xg.ignorableWhitespace("\n\t\t")
+            xg.startElement("testcase", {"name": _xml_safe(name), "classname": suite_name,
+                                         "time": f"{duration:.6f}"})
+            r = results.failures.get(i)
+            if r is not None:
+                msg = "输出不匹配或退出码非0"
+                detail = (f"INPUT:\n{r.input_data}\n\nEXPECTED:\n{_text(r.expected)}\n\nACTUAL:\n{_text(r.actual)}\n\n"
+                          f"EXIT_CODE: {r.exit_code}\nSTDERR:\n{_text(r.stderr)}\n\nLLM ANALYSIS:\n{r.analysis or '(none)'}\n")
+                xg.ignorableWhitespace("\n\t\t\t")
+                xg.startElement("failure", {"type": "failure", "message": msg})
+                xg.characters(_xml_safe(detail))
+                xg.endElement("failure")
+                xg.ignorableWhitespace("\n\t\t")
+            xg.endElement("testcase")
+        xg.ignorableWhitespace("\n\t")
+        xg.endElement("testsuite")
+        xg.ignorableWhitespace("\n")
+        xg.endElement("testsuites")
+        xg.ignorableWhitespace("\n")
+        xg.endDocument()
+
+
 # ============== 初始化样例 ==============
 SAMPLE_JSON = [
     {
@@ -311,24 +839,50 @@ SAMPLE_JSON = [
 SAMPLE_PROGRAM = """#!/usr/bin/env python3\nimport sys\n# 一个有意带小问题的程序：未折叠多空格、未处理前导零\n# 运行方式: python sample_prog.py < input.txt\n\nline = sys.stdin.read().strip()\nif not line:\n    print(0)\n    sys.exit(0)\n# 简单相加：期望输入是"a b"\nparts = line.split(' ')  # 多空格会产生空字段\nparts = [p for p in parts if p]  # 粗暴去空元素\ntry:\n    a, b = map(int, parts[:2])\n    print(a + b)\nexcept Exception as e:\n    print(f"ERR: {e}", file=sys.stderr)\n    sys.exit(1)\n"""
 
 
+def _write_file(path: str, data: bytes, mode: int):
+    """创建时即带上最终权限位写入文件，省去单独的 chmod 元数据往返（网络文件系统上明显）。"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 def init_scaffold():
-    with open("tests.json", "w", encoding="utf-8") as f:
-        json.dump(SAMPLE_JSON, f, ensure_ascii=False, indent=2)
-    with open("sample_prog.py", "w", encoding="utf-8") as f:
-        f.write(SAMPLE_PROGRAM)
-    os.chmod("sample_prog.py", 0o755)
+    if orjson is not None:
+        tests_data = orjson.dumps(SAMPLE_JSON, option=orjson.OPT_INDENT_2)
+    else:
+        tests_data = json.dumps(SAMPLE_JSON, ensure_ascii=False, indent=2).encode("utf-8")
+    _write_file("tests.json", tests_data, 0o644)
+    _write_file("sample_prog.py", SAMPLE_PROGRAM.encode("utf-8"), 0o755)
     print("已生成 tests.json 与 sample_prog.py。\n运行示例：\n  python agent_test_tool.py --cmd \"python sample_prog.py\" --tests tests.json\n")
 
 
 # ============== CLI ==============
 
+def _positive_int(value: str) -> int:
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"需要正整数: {value!r}")
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"需要正整数: {value!r}")
+    return n
+
+
 def main():
     p = argparse.ArgumentParser(description="带 LLM 分析的智能测试小工具")
     p.add_argument("--cmd", type=str, help="被测命令，例如: 'python your_code.py' 或 './bin'", default=None)
-    p.add_argument("--tests", type=str, help="测试文件(.json/.yaml)")
+    p.add_argument("--tests", type=str, help="测试文件(.json/.jsonl/.yaml)")
     p.add_argument("--no-llm", action="store_true", help="禁用 LLM 分析")
     p.add_argument("--junit", type=str, default=None, help="输出 JUnit XML 报告到该路径")
     p.add_argument("--init", action="store_true", help="生成样例 tests.json 与 sample_prog.py")
+    p.add_argument("--jobs", type=_positive_int, default=None, help="并发执行的用例数（默认 CPU 核数）")
+    p.add_argument("--cache-dir", type=str, default=None,
+                   help="启用子进程输出缓存并存放于该目录（默认关闭）；缓存只跟踪命令行中出现的文件，"
+                        "被测程序依赖其他文件时结果可能过期")
     args = p.parse_args()
 
     if args.init:
@@ -343,10 +897,11 @@ def main():
         return 2
 
     tests = load_tests(args.tests)
-    results = run_suite(args.cmd, tests, use_llm=(not args.no_llm))
+    results = run_suite(args.cmd, tests, use_llm=(not args.no_llm), jobs=args.jobs,
+                        cache_dir=args.cache_dir)
 
     total = len(results)
-    passed = sum(1 for r in results if r.passed)
+    passed = results.passed_count
     failed = total - passed
     print("=" * 60)
     print(f"Total: {total}  Passed: {passed}  Failed: {failed}")
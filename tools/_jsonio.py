@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+tools/ 下各脚本共用的 JSON 读写：装了 orjson 就用它，否则退回标准库 json。
+脚本以 python tools/xxx.py 方式运行时 tools/ 在 sys.path 首位，可直接 import。
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_loads(s):
+    return orjson.loads(s) if orjson is not None else json.loads(s)
+
+def json_dumps_pretty(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def json_dumps_line(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
@@ -2,10 +2,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-全自动①：边界值/组合覆盖/变异/模糊 生成 tests_enum.json
+全自动①：边界值/组合覆盖/变异/模糊 生成 tests_enum.jsonl（一行一个用例，可流式读写）
 针对“读取一行包含两个整数并输出其和”的示例程序，可按需替换为你的业务。
 """
-import json, itertools
+import itertools
+
+from _jsonio import json_dumps_line
 
 def add_oracle(a: int, b: int) -> str:
     return f"{a + b}\n"
@@ -13,10 +15,12 @@ def add_oracle(a: int, b: int) -> str:
 def cases():
     numbers = [0, 1, 2, 9, 10, 99, 100, 10**6, -1, -999999]
     whites  = [" ", "  ", "\t", "   "]
-    # 边界 + 组合覆盖
-    for a, b in itertools.product(numbers, numbers):
+    # 边界 + 组合覆盖：数字只格式化一次，期望值按数对计算一次，内层只做字符串拼接
+    strs = [str(n) for n in numbers]
+    for (a, sa), (b, sb) in itertools.product(zip(numbers, strs), repeat=2):
+        exp = add_oracle(a, b)
         for ws in whites:
-            yield f"{a}{ws}{b}\n", add_oracle(a, b)
+            yield sa + ws + sb + "\n", exp
 
     # 变异/模糊样例（格式扰动/非法输入）
     weird_inputs = [
@@ -37,19 +41,28 @@ def cases():
             if len(parts) >= 2 and all(p.lstrip("-").isdigit() for p in parts[:2]):
                 yield s, add_oracle(int(parts[0]), int(parts[1]))
 
+def unique_cases():
+    # 去掉完全相同的 (input, expected)，避免重复启动子进程
+    seen = set()
+    for pair in cases():
+        if pair not in seen:
+            seen.add(pair)
+            yield pair
+
 def main():
-    tests = []
-    for i, (inp, exp) in enumerate(cases(), 1):
-        tests.append({
-            "name": f"auto-enum-{i}",
-            "input": inp,
-            "expected": exp,
-            "timeout": 2,
-            "normalize": {"strip": True, "collapse_ws": True}
-        })
-    with open("tests_enum.json", "w", encoding="utf-8") as f:
-        json.dump(tests, f, ensure_ascii=False, indent=2)
-    print(f"已生成 {len(tests)} 条枚举用例到 tests_enum.json")
+    n = 0
+    with open("tests_enum.jsonl", "w", encoding="utf-8") as f:
+        for i, (inp, exp) in enumerate(unique_cases(), 1):
+            f.write(json_dumps_line({
+                "name": f"auto-enum-{i}",
+                "input": inp,
+                "expected": exp,
+                "timeout": 2,
+                "normalize": {"strip": True, "collapse_ws": True}
+            }))
+            f.write("\n")
+            n = i
+    print(f"已生成 {n} 条枚举用例到 tests_enum.jsonl")
 
 if __name__ == "__main__":
     main()
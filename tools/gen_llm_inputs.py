@@ -5,13 +5,16 @@
 全自动②A：大模型只生成“输入”，期望值由参考实现/规约计算（最稳妥）。
 需要环境变量：OPENAI_API_KEY 或 OPENAI_BASE_URL（私有化网关）/AGENT_MODEL。
 """
-import os, json
+import os
 from openai import OpenAI
 
+from _jsonio import json_dumps_line, json_loads
+
 # 参考实现/规约 —— 请替换为你的业务逻辑
 def oracle_eval(s: str) -> str:
-    parts = s.strip().split()
-    if len(parts) >= 2 and all(p.lstrip("-").isdigit() for p in parts[:2]):
+    # 只切出前两个字段：split() 本身跳过首尾空白，无需 strip，也不切分剩余部分
+    parts = s.split(None, 2)
+    if len(parts) >= 2 and parts[0].lstrip("-").isdigit() and parts[1].lstrip("-").isdigit():
         return f"{int(parts[0]) + int(parts[1])}\n"
     return "ERR\n"
 
@@ -35,22 +38,28 @@ def main():
         temperature=0.0,
     )
     content = resp.choices[0].message.content
-    data = json.loads(content)  # 严格JSON
+    data = json_loads(content)  # 严格JSON
     tests=[]
-    for i, inp in enumerate(data["inputs"], 1):
+    seen = set()  # LLM 常给出重复输入；期望由输入决定，按输入去重即可
+    for inp in data["inputs"]:
         if not inp.endswith("\n"):
             inp += "\n"
+        if inp in seen:
+            continue
+        seen.add(inp)
         exp = oracle_eval(inp)
         tests.append({
-            "name": f"llm-auto-{i}",
+            "name": f"llm-auto-{len(tests) + 1}",
             "input": inp,
             "expected": exp,
             "timeout": 2,
             "normalize": {"strip": True, "collapse_ws": True}
         })
-    with open("tests_llm.json", "w", encoding="utf-8") as f:
-        json.dump(tests, f, ensure_ascii=False, indent=2)
-    print(f"已生成 {len(tests)} 条 LLM 输入用例到 tests_llm.json")
+    with open("tests_llm.jsonl", "w", encoding="utf-8") as f:
+        for t in tests:
+            f.write(json_dumps_line(t))
+            f.write("\n")
+    print(f"已生成 {len(tests)} 条 LLM 输入用例到 tests_llm.jsonl")
 
 if __name__ == "__main__":
     main()
@@ -5,12 +5,15 @@
 全自动②B：LLM 同时生成“输入 + 期望”，再用独立 oracle 校验过滤，防止幻觉。
 需要环境变量：OPENAI_API_KEY 或 OPENAI_BASE_URL/AGENT_MODEL。
 """
-import os, json
+import os
 from openai import OpenAI
 
+from _jsonio import json_dumps_line, json_loads
+
 def oracle_eval(inp: str) -> str:
-    parts = inp.strip().split()
-    if len(parts) >= 2 and all(p.lstrip("-").isdigit() for p in parts[:2]):
+    # 独立于 LLM 的规约，与 gen_llm_inputs.oracle_eval 一致
+    parts = inp.split(None, 2)
+    if len(parts) >= 2 and parts[0].lstrip("-").isdigit() and parts[1].lstrip("-").isdigit():
         return f"{int(parts[0]) + int(parts[1])}\n"
     return "ERR\n"
 
@@ -30,13 +33,15 @@ def main():
                   {"role":"user","content":USR}],
         temperature=0.0,
     )
-    data = json.loads(resp.choices[0].message.content)
+    data = json_loads(resp.choices[0].message.content)
     cleaned=[]
+    seen = set()  # 去掉重复的 (input, expected)
     for i, c in enumerate(data["cases"], 1):
         inp = c["input"] if c["input"].endswith("\n") else c["input"]+"\n"
         exp_llm = c["expected"] if c["expected"].endswith("\n") else c["expected"]+"\n"
         exp_true = oracle_eval(inp)
-        if exp_true == exp_llm:
+        if exp_true == exp_llm and (inp, exp_true) not in seen:
+            seen.add((inp, exp_true))
             cleaned.append({
                 "name": f"llm-io-{i}",
                 "input": inp,
@@ -44,9 +49,11 @@ def main():
                 "timeout": 2,
                 "normalize": {"strip": True, "collapse_ws": True}
             })
-    with open("tests_llm_clean.json", "w", encoding="utf-8") as f:
-        json.dump(cleaned, f, ensure_ascii=False, indent=2)
-    print(f"LLM产出 {len(data['cases'])} 条，用独立校验后保留 {len(cleaned)} 条 → tests_llm_clean.json")
+    with open("tests_llm_clean.jsonl", "w", encoding="utf-8") as f:
+        for t in cleaned:
+            f.write(json_dumps_line(t))
+            f.write("\n")
+    print(f"LLM产出 {len(data['cases'])} 条，用独立校验后保留 {len(cleaned)} 条 → tests_llm_clean.jsonl")
 
 if __name__ == "__main__":
     main()
@@ -2,71 +2,182 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-把多种常见日志格式抽取为 tests.json：
+把多种常见日志格式抽取为测试用例（--out 以 .jsonl 结尾写 JSON Lines，默认；以 .json 结尾写 JSON 数组）：
 支持3种输入：
 1) 纯文本行：IN:<...> OUT:<...>
 2) JSON 行：{"input": "...", "expected": "..."}  （一行一个 JSON）
 3) CI 存档文本块：---CASE---、INPUT:\n...\nEXPECTED:\n...
-用法：python tools/log2tests.py --in app.log --out tests.json --name-prefix "regression-" --strip
+用法：python tools/log2tests.py --in app.log --out tests.jsonl --name-prefix "regression-" --strip
 """
-import argparse, json, re, uuid, sys
+import argparse, hashlib, io, itertools, mmap, os, re, stat, textwrap, uuid, sys
+
+from _jsonio import json_dumps_line, json_dumps_pretty, json_loads
 
 pat_text = re.compile(r"IN\s*:\s*(?P<input>.*?)\s*OUT\s*:\s*(?P<expected>.*)$")
-pat_ci   = re.compile(r"---CASE---.*?INPUT:\s*(?P<input>.*?)\n+EXPECTED:\s*(?P<expected>.*?)\n(?=---CASE---|$)", re.S)
+CASE_SEP = "---CASE---"
 
-def parse_lines(raw: str):
-    cases = []
-    # JSON 行
-    for line in raw.splitlines():
-        line = line.strip()
-        if not line:
-            continue
+def parse_line(line: str):
+    """单行格式：JSON 行或 IN:... OUT:...；不匹配返回 None。"""
+    line = line.strip()
+    if not line:
+        return None
+    # JSON 行（对象必以 { 开头，其余行不必尝试解析）
+    if line.startswith("{"):
         try:
-            obj = json.loads(line)
+            obj = json_loads(line)
             if isinstance(obj, dict) and "input" in obj and "expected" in obj:
-                cases.append((obj["input"], obj["expected"]))
-                continue
+                return obj["input"], obj["expected"]
         except Exception:
             pass
-        # 文本行：IN:... OUT:...
-        m = pat_text.search(line)
-        if m:
-            inp, exp = m.group("input"), m.group("expected")
-            if not inp.endswith("\n"): inp += "\n"
-            if not exp.endswith("\n"): exp += "\n"
-            cases.append((inp, exp))
-    # CI 文本块
-    for m in pat_ci.finditer(raw):
-        cases.append((m.group("input"), m.group("expected")))
-    return cases
+    # 文本行：IN:... OUT:...
+    m = pat_text.search(line)
+    if m:
+        inp, exp = m.group("input"), m.group("expected")
+        if not inp.endswith("\n"): inp += "\n"
+        if not exp.endswith("\n"): exp += "\n"
+        return inp, exp
+    return None
+
+def parse_stream(lines):
+    """单趟逐行解析（行已按通用换行切分），边读边产出 (input, expected)，内存只保留当前 CI 块。
+
+    CI 块从 ---CASE--- 开始、到下一个 ---CASE--- 或文件末尾结束，按
+    head（找 INPUT:）→ input（到行首 EXPECTED:）→ expected 三种状态累积。
+    单行格式按 str.splitlines 的行边界（含换页符等）检查，与块内容互不影响。
+    """
+    mode = None  # None: 不在块内；"head" / "input" / "expected"
+    inp_buf, exp_buf = [], []
+
+    def flush(at_eof):
+        if mode != "expected":
+            return None
+        exp = "".join(exp_buf)
+        # 期望值截止到块末换行；文件末尾允许多一个空行
+        if at_eof and exp.endswith("\n\n"):
+            exp = exp[:-1]
+        if not exp.endswith("\n"):
+            return None
+        return "".join(inp_buf).lstrip().rstrip("\n"), exp[:-1].lstrip()
+
+    def feed(text):
+        nonlocal mode
+        if mode == "head":
+            _, sep, rest = text.partition("INPUT:")
+            if sep:
+                mode = "input"
+                inp_buf.append(rest)
+        elif mode == "input":
+            if text.startswith("EXPECTED:"):
+                mode = "expected"
+                exp_buf.append(text[len("EXPECTED:"):])
+            else:
+                inp_buf.append(text)
+        elif mode == "expected":
+            exp_buf.append(text)
+
+    for line in lines:
+        for piece in line.splitlines():
+            case = parse_line(piece)
+            if case is not None:
+                yield case
+        rest = line
+        while CASE_SEP in rest:
+            before, _, rest = rest.partition(CASE_SEP)
+            feed(before)
+            case = flush(False)
+            if case is not None:
+                yield case
+            mode = "head"
+            inp_buf, exp_buf = [], []
+        feed(rest)
+    case = flush(True)
+    if case is not None:
+        yield case
+
+def _universal_lines(text: str):
+    """与文本模式的通用换行一致：CRLF 与单独的 CR 都视作换行。"""
+    if "\r" not in text:
+        return (text,)
+    return io.StringIO(text, newline=None)
+
+def iter_file_lines(path: str):
+    """逐行产出输入文件的 str 行，不整体读入内存。
+
+    普通文件经 mmap 只读映射、由页缓存按需换入，逐行取出后解码（UTF-8 多字节序列不含换行
+    字节，逐行解码与整体解码结果相同）；管道、/dev/stdin、<(zcat ...) 等无法 mmap 的输入
+    以及空文件走文本模式逐行读取。
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for raw in iter(mm.readline, b""):
+                    yield from _universal_lines(raw.decode("utf-8", errors="ignore"))
+        else:
+            # 复用已打开的描述符：FIFO 重新打开可能错过写端已写入的数据
+            with io.TextIOWrapper(f, encoding="utf-8", errors="ignore") as text:
+                yield from text
+
+def parse_lines(raw: str):
+    return list(parse_stream(io.StringIO(raw, newline=None)))
+
+def _case_digest(inp: str, exp: str) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    # 带长度前缀，避免 (inp, exp) 拼接后边界含糊
+    h.update(f"{len(inp)}:".encode("ascii"))
+    h.update(inp.encode("utf-8", errors="surrogatepass"))
+    h.update(exp.encode("utf-8", errors="surrogatepass"))
+    return h.digest()
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--in", dest="in_path", required=True, help="日志/CI/JSON行 文件路径")
-    ap.add_argument("--out", dest="out_path", default="tests.json")
+    ap.add_argument("--out", dest="out_path", default="tests.jsonl", help="输出路径(.jsonl/.json)")
     ap.add_argument("--name-prefix", default="regress-")
     ap.add_argument("--strip", action="store_true", help="默认对期望/实际做strip和折叠空白")
     args = ap.parse_args()
 
-    raw = open(args.in_path, "r", encoding="utf-8", errors="ignore").read()
-    pairs = parse_lines(raw)
-    if not pairs:
+    pairs = parse_stream(iter_file_lines(args.in_path))
+    first = next(pairs, None)
+    if first is None:
         print("未解析到任何 (input, expected)。请检查日志格式。", file=sys.stderr)
         sys.exit(1)
+    pairs = itertools.chain([first], pairs)
 
-    tests = []
-    for i, (inp, exp) in enumerate(pairs, 1):
-        tests.append({
-            "name": f"{args.name_prefix}{i}-{uuid.uuid4().hex[:6]}",
-            "input": inp if inp.endswith("\n") else inp + "\n",
-            "expected": exp if exp.endswith("\n") else exp + "\n",
-            "timeout": 2,
-            "normalize": {"strip": True, "collapse_ws": True} if args.strip else {"strip": True}
-        })
+    def iter_tests():
+        # 日志里同一用例常反复出现，只保留首个；只记 16 字节摘要，不保留用例文本
+        seen = set()
+        for inp, exp in pairs:
+            inp = inp if inp.endswith("\n") else inp + "\n"
+            exp = exp if exp.endswith("\n") else exp + "\n"
+            digest = _case_digest(inp, exp)
+            if digest in seen:
+                continue
+            seen.add(digest)
+            yield {
+                "name": f"{args.name_prefix}{len(seen)}-{uuid.uuid4().hex[:6]}",
+                "input": inp,
+                "expected": exp,
+                "timeout": 2,
+                "normalize": {"strip": True, "collapse_ws": True} if args.strip else {"strip": True}
+            }
 
+    # 逐条序列化写出，不在内存中再构造一份完整的用例列表
+    n = 0
     with open(args.out_path, "w", encoding="utf-8") as f:
-        json.dump(tests, f, ensure_ascii=False, indent=2)
-    print(f"生成 {len(tests)} 条用例到 {args.out_path}")
+        if args.out_path.lower().endswith(".jsonl"):
+            for t in iter_tests():
+                f.write(json_dumps_line(t))
+                f.write("\n")
+                n += 1
+        else:
+            f.write("[")
+            for t in iter_tests():
+                f.write(",\n" if n else "\n")
+                f.write(textwrap.indent(json_dumps_pretty(t), "  "))
+                n += 1
+            f.write("\n]")
+    print(f"生成 {n} 条用例到 {args.out_path}")
 
 if __name__ == "__main__":
     main()